@@ -489,6 +489,18 @@ all the routes matching the spec::
     # get all IPv6 routes from some table
     ipdb.routes.table[tnum].filter({'family': AF_INET6})
 
+`ipdb.routes.filter()` returns an iterator over the route records
+of all the tables, use `list()` to get a list. The `filter()` of
+one table returns a list.
+
+To get the route to an address by the longest prefix match::
+
+    # the most specific route to the address, main table
+    ipdb.routes.lookup('10.0.0.1')
+
+    # the same in some table
+    ipdb.routes.lookup('10.0.0.1', table=tnum)
+
 Route metrics
 ~~~~~~~~~~~~~
 
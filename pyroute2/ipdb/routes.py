@@ -1,10 +1,13 @@
 import logging
 import struct
+import sys
 import threading
 import time
 import traceback
 import types
 from collections import namedtuple
+from itertools import chain, compress, repeat
+from operator import eq, is_not, itemgetter
 from socket import AF_INET, AF_INET6, AF_UNSPEC, inet_ntop, inet_pton
 
 from pyroute2.common import AF_MPLS, basestring
@@ -27,34 +30,74 @@ groups = (
     rtnl.RTMGRP_IPV4_ROUTE | rtnl.RTMGRP_IPV6_ROUTE | rtnl.RTMGRP_MPLS_ROUTE
 )
 IP6_RT_PRIO_USER = 1024
+RT_TABLE_MAIN = 254
+# addresses and labels are used as key members, share them
+_intern = sys.intern
+# NLA name conversions for route messages, calculated once; the
+# names are built with str.lower() and become route dict keys, so
+# intern them to match the field name literals by identity
+_nla2name = dict(
+    [(x[0], _intern(rtmsg.nla2name(x[0]))) for x in rtmsg.nla_map]
+)
+_rtax2name = dict(
+    [
+        (x[0], _intern(rtmsg.metrics.nla2name(x[0])))
+        for x in rtmsg.metrics.nla_map
+    ]
+)
 
 
 class Metrics(Transactional):
-    _fields = [rtmsg.metrics.nla2name(i[0]) for i in rtmsg.metrics.nla_map]
+    _fields = list(_rtax2name.values())
+    _fields_set = frozenset(_fields)
 
 
 class Encap(Transactional):
     _fields = ['type', 'labels']
+    _fields_set = frozenset(_fields)
 
 
 class Via(Transactional):
     _fields = ['family', 'addr']
+    _fields_set = frozenset(_fields)
 
 
 class NextHopSet(LinkedSet):
     def __init__(self, prime=None):
         super(NextHopSet, self).__init__()
+        # short key -> keys, to look up nexthops in remove()
+        self._by_skey = {}
         prime = prime or []
         for v in prime:
             self.add(v)
 
     def __sub__(self, vs):
         ret = type(self)()
-        sub = set(self.raw.keys()) - set(vs.raw.keys())
-        for v in sub:
-            ret.add(self[v], raw=self.raw[v])
+        with self.lock:
+            for key, value in self.raw.items():
+                if key not in vs.raw:
+                    ret.add(value, raw=value)
         return ret
 
+    def sync(self, vs):
+        '''
+        Add and remove nexthops to match another NextHopSet
+        or an iterable of nexthops
+        '''
+        if not isinstance(vs, NextHopSet):
+            vs = NextHopSet(vs)
+        with self.lock:
+            if not self.raw:
+                for value in tuple(vs.raw.values()):
+                    self.add(value)
+                return
+            for key, value in tuple(vs.raw.items()):
+                if key not in self.raw:
+                    self.add(value)
+            for key, value in tuple(self.raw.items()):
+                if key not in vs.raw:
+                    self.remove(value)
+
     def __make_nh(self, prime):
         if isinstance(prime, BaseRoute):
             return prime.make_nh_key(prime)
@@ -72,35 +115,44 @@ class NextHopSet(LinkedSet):
         return self.raw[key]
 
     def __iter__(self):
-        def NHIterator():
-            for x in tuple(self.raw.values()):
-                yield x
-
-        return NHIterator()
+        # iterate a snapshot: callers like load_netlink() remove
+        # nexthops while iterating, and linked sets are updated
+        # from the event thread
+        return iter(tuple(self.raw.values()))
+
+    @staticmethod
+    def _short_key(key):
+        # only the required fields, the rest is None
+        req = key._required
+        return key[:req] + (None,) * (len(key) - req)
 
     def add(self, prime, raw=None, cascade=False):
         key = self.__make_nh(prime)
-        req = key._required
-        fields = key._fields
-        skey = key[:req] + (None,) * (len(fields) - req)
-        if skey in self.raw:
-            del self.raw[skey]
-        return super(NextHopSet, self).add(key, raw=prime)
+        skey = self._short_key(key)
+        self.raw.pop(skey, None)
+        ret = super(NextHopSet, self).add(key, raw=prime)
+        self._by_skey.setdefault(skey, {})[key] = None
+        return ret
 
     def remove(self, prime, raw=None, cascade=False):
         key = self.__make_nh(prime)
+        skey = self._short_key(key)
         try:
             super(NextHopSet, self).remove(key)
         except KeyError as e:
-            req = key._required
-            fields = key._fields
-            skey = key[:req] + (None,) * (len(fields) - req)
-            for rkey in tuple(self.raw.keys()):
-                if skey == rkey[:req] + (None,) * (len(fields) - req):
+            # the index may hold stale keys, so check the raw dict
+            for rkey in tuple(self._by_skey.get(skey, ())):
+                if rkey in self.raw:
                     break
             else:
                 raise e
             super(NextHopSet, self).remove(rkey)
+            key = rkey
+        keys = self._by_skey.get(skey)
+        if keys is not None and key not in self.raw:
+            keys.pop(key, None)
+            if not keys:
+                del self._by_skey[skey]
 
 
 class WatchdogMPLSKey(dict):
@@ -116,27 +168,29 @@ class WatchdogKey(dict):
     a match for IPDB watchdogs.
     '''
 
+    fields = frozenset(
+        (
+            'dst',
+            'dst_len',
+            'src',
+            'src_len',
+            'tos',
+            'priority',
+            'gateway',
+            'table',
+        )
+    )
+
     def __init__(self, route):
         dict.__init__(
             self,
-            [
+            (
                 x
                 for x in RequestProcessor(
                     RouteFieldFilter(), context=route, prime=route
                 ).items()
-                if x[0]
-                in (
-                    'dst',
-                    'dst_len',
-                    'src',
-                    'src_len',
-                    'tos',
-                    'priority',
-                    'gateway',
-                    'table',
-                )
-                and x[1]
-            ],
+                if x[0] in self.fields and x[1]
+            ),
         )
 
 
@@ -187,12 +241,14 @@ class BaseRoute(Transactional):
     Persistent transactional route object
     '''
 
-    _fields = [rtmsg.nla2name(i[0]) for i in rtmsg.nla_map]
-    for key, _ in rtmsg.fields:
-        _fields.append(key)
-    _fields.append('removal')
     _virtual_fields = ['ipdb_scope', 'ipdb_priority']
-    _fields.extend(_virtual_fields)
+    _fields = (
+        list(_nla2name.values())
+        + [x[0] for x in rtmsg.fields]
+        + ['removal']
+        + _virtual_fields
+    )
+    _fields_set = frozenset(_fields)
     _linked_sets = ['multipath']
     _nested = []
     _gctime = None
@@ -255,6 +311,17 @@ class BaseRoute(Transactional):
 
             self['ipdb_scope'] = 'system'
 
+            # walk the NLA chain only once; like msg.get_attr(),
+            # use the first cell by name, decode values on demand
+            cells = {}
+            for cell in msg.get('attrs', ()):
+                cells.setdefault(cell[0], cell)
+
+            def get_attr(name):
+                cell = cells.get(name)
+                if cell is not None:
+                    return cell[1]
+
             # IPv6 multipath via several devices (not networks) is a very
             # special case, since we get only the first hop notification. Ask
             # the kernel guys why. I've got no idea.
@@ -263,12 +330,12 @@ class BaseRoute(Transactional):
             flags = msg.get('header', {}).get('flags', 0)
             family = msg.get('family', 0)
             clean_mp = True
-            table = msg.get_attr('RTA_TABLE') or msg.get('table')
-            dst = msg.get_attr('RTA_DST')
+            table = get_attr('RTA_TABLE') or msg.get('table')
+            dst = get_attr('RTA_DST')
             #
             # It MAY be a multipath hop
             #
-            if family == AF_INET6 and not msg.get_attr('RTA_MULTIPATH'):
+            if family == AF_INET6 and not get_attr('RTA_MULTIPATH'):
                 #
                 # It is a notification about the route created
                 #
@@ -319,7 +386,7 @@ class BaseRoute(Transactional):
                 #
                 # Parse on demand
                 #
-                norm = rtmsg.nla2name(cell[0])
+                norm = _nla2name.get(cell[0]) or rtmsg.nla2name(cell[0])
                 if norm in self.cleanup:
                     continue
                 value = cell[1]
@@ -329,7 +396,9 @@ class BaseRoute(Transactional):
                         for metric in tuple(self['metrics'].keys()):
                             del self['metrics'][metric]
                         for rtax, rtax_value in value['attrs']:
-                            rtax_norm = rtmsg.metrics.nla2name(rtax)
+                            rtax_norm = _rtax2name.get(rtax)
+                            if rtax_norm is None:
+                                rtax_norm = rtmsg.metrics.nla2name(rtax)
                             self['metrics'][rtax_norm] = rtax_value
                 elif norm == 'multipath':
                     for record in value:
@@ -350,54 +419,77 @@ class BaseRoute(Transactional):
                             for dst in value.get_attr('MPLS_IPTUNNEL_DST'):
                                 ret.append(str(dst['label']))
                             if ret:
-                                self['encap']['labels'] = '/'.join(ret)
+                                self['encap']['labels'] = _intern(
+                                    '/'.join(ret)
+                                )
                 elif norm == 'via':
                     with self['via']._direct_state:
                         self['via'] = value
                 elif norm == 'newdst':
                     self['newdst'] = [x['label'] for x in value]
+                elif norm in ('gateway', 'src', 'prefsrc') and isinstance(
+                    value, str
+                ):
+                    self[norm] = _intern(value)
                 else:
                     self[norm] = value
 
             if msg.get('family', 0) == AF_MPLS:
-                dst = msg.get_attr('RTA_DST')
+                dst = get_attr('RTA_DST')
                 if dst:
                     dst = dst[0]['label']
             else:
-                if msg.get_attr('RTA_DST'):
-                    dst = '%s/%s' % (msg.get_attr('RTA_DST'), msg['dst_len'])
+                if get_attr('RTA_DST'):
+                    dst = _intern(
+                        '%s/%s' % (get_attr('RTA_DST'), msg['dst_len'])
+                    )
                 else:
                     dst = 'default'
             self['dst'] = dst
 
             # fix RTA_ENCAP_TYPE if needed
-            if msg.get_attr('RTA_ENCAP'):
+            if get_attr('RTA_ENCAP'):
                 if self['encap_type'] is not None:
                     with self['encap']._direct_state:
                         self['encap']['type'] = self['encap_type']
                     self['encap_type'] = None
             # or drop encap, if there is no RTA_ENCAP in msg
+            #
+            # nested objects that are empty already are not reset,
+            # as the reset creates new transactionals for encap and
+            # metrics
             elif self['encap'] is not None:
                 self['encap_type'] = None
-                with self['encap']._direct_state:
-                    self['encap'] = {}
+                if any(self['encap'].values()):
+                    with self['encap']._direct_state:
+                        self['encap'] = {}
 
             # drop metrics, if there is no RTA_METRICS in msg
-            if not msg.get_attr('RTA_METRICS') and self['metrics'] is not None:
-                with self['metrics']._direct_state:
+            metrics = self['metrics']
+            if (
+                not get_attr('RTA_METRICS')
+                and metrics is not None
+                and any(metrics.values())
+            ):
+                with metrics._direct_state:
                     self['metrics'] = {}
 
             # same for via
-            if not msg.get_attr('RTA_VIA') and self['via'] is not None:
-                with self['via']._direct_state:
+            via = self['via']
+            if (
+                not get_attr('RTA_VIA')
+                and via is not None
+                and any(via.values())
+            ):
+                with via._direct_state:
                     self['via'] = {}
 
             # one hop -> multihop transition
-            if not msg.get_attr('RTA_GATEWAY') and self['gateway'] is not None:
+            if not get_attr('RTA_GATEWAY') and self['gateway'] is not None:
                 self['gateway'] = None
             if (
                 'oif' not in msg
-                and not msg.get_attr('RTA_OIF')
+                and not get_attr('RTA_OIF')
                 and self['oif'] is not None
             ):
                 self['oif'] = None
@@ -407,31 +499,25 @@ class BaseRoute(Transactional):
                 if item in self:
                     del self[item]
 
-    def commit(
-        self, tid=None, transaction=None, commit_phase=1, commit_mask=0xFF
-    ):
-        if not commit_phase & commit_mask:
-            return self
+    @staticmethod
+    def _drops_nested(snapshot, added):
+        '''
+        Check if the transaction drops metrics or encap
+        '''
+        for key in ('metrics', 'encap'):
+            if any(snapshot[key].values()) and not any(
+                added.get(key, {}).values()
+            ):
+                return True
+        return False
 
-        error = None
-        drop = self.ipdb.txdrop
+    def _commit_once(self, transaction, commit_phase):
+        '''
+        Run one commit phase, return (error, snapshot, debug).
+        '''
         devop = 'set'
-        cleanup = []
         # FIXME -- make a debug object
         debug = {'traceback': None, 'next_stage': None}
-        notx = True
-
-        if tid or transaction:
-            notx = False
-
-        if tid:
-            transaction = self.global_tx[tid]
-        else:
-            transaction = transaction or self.current_tx
-
-        # ignore global rollbacks on invalid routes
-        if self['ipdb_scope'] == 'create' and commit_phase > 1:
-            return
 
         # create a new route
         if self['ipdb_scope'] != 'system':
@@ -445,18 +531,12 @@ class BaseRoute(Transactional):
 
         try:
             # route set
-            if self['family'] != AF_MPLS:
-                cleanup = [
-                    any(snapshot['metrics'].values())
-                    and not any(added.get('metrics', {}).values()),
-                    any(snapshot['encap'].values())
-                    and not any(added.get('encap', {}).values()),
-                ]
+            mpls = self['family'] == AF_MPLS
             if (
-                any(added.values())
-                or any(cleanup)
+                devop == 'add'
+                or any(added.values())
                 or removed.get('multipath', None)
-                or devop == 'add'
+                or (not mpls and self._drops_nested(snapshot, added))
             ):
                 # prepare multipath target sync
                 wlist = []
@@ -484,24 +564,27 @@ class BaseRoute(Transactional):
                 new_key = self.make_key(transaction)
                 if old_key != new_key:
                     # assume we can not move routes between tables (yet ;)
-                    if self['family'] == AF_MPLS:
-                        route_index = self.ipdb.routes.tables['mpls'].idx
+                    if mpls:
+                        route_table = self.ipdb.routes.tables['mpls']
                     else:
-                        route_index = self.ipdb.routes.tables[
-                            self['table'] or 254
-                        ].idx
-                    # re-link the route record
-                    if new_key in route_index:
-                        raise CommitException('route idx conflict')
-                    else:
-                        route_index[new_key] = {'key': new_key, 'route': self}
-                    # wipe the old key, if needed
-                    if old_key in route_index:
-                        del route_index[old_key]
+                        route_table = self.ipdb.routes.tables[
+                            self['table'] or RT_TABLE_MAIN
+                        ]
+                    # re-link the route record; the event thread
+                    # updates the table under the lock as well
+                    with route_table.lock:
+                        if new_key in route_table.idx:
+                            raise CommitException('route idx conflict')
+                        route_table._link(
+                            new_key, {'key': new_key, 'route': self}
+                        )
+                        # wipe the old key, if needed
+                        if old_key in route_table.idx:
+                            route_table._unlink(old_key)
                 self.nl.route(devop, **transaction)
                 # delete old record, if required
                 if (old_key != new_key) and (devop == 'set'):
-                    req = dict(old_key._asdict())
+                    req = old_key._asdict()
                     # update the request with the scope.
                     #
                     # though the scope isn't a part of the
@@ -538,26 +621,53 @@ class BaseRoute(Transactional):
                     with self._direct_state:
                         self['ipdb_scope'] = 'shadow'
 
-            # success, so it's safe to drop the transaction
-            drop = True
+            return None, snapshot, debug
 
         except Exception as e:
-            error = e
             # prepare postmortem
             debug['traceback'] = traceback.format_exc()
             debug['error_stack'] = []
             debug['next_stage'] = None
+            return e, snapshot, debug
 
-            if commit_phase == 1:
-                try:
-                    self.commit(
-                        transaction=snapshot,
-                        commit_phase=2,
-                        commit_mask=commit_mask,
-                    )
-                except Exception as i_e:
-                    debug['next_stage'] = i_e
-                    error = RuntimeError()
+    def commit(
+        self, tid=None, transaction=None, commit_phase=1, commit_mask=0xFF
+    ):
+        if not commit_phase & commit_mask:
+            return self
+
+        drop = self.ipdb.txdrop
+        notx = True
+
+        if tid or transaction:
+            notx = False
+
+        if tid:
+            transaction = self.global_tx[tid]
+        else:
+            transaction = transaction or self.current_tx
+
+        # ignore global rollbacks on invalid routes
+        if self['ipdb_scope'] == 'create' and commit_phase > 1:
+            return
+
+        error, snapshot, debug = self._commit_once(transaction, commit_phase)
+        if error is None:
+            # success, so it's safe to drop the transaction
+            drop = True
+        elif (
+            commit_phase == 1
+            and commit_mask & 2
+            and self['ipdb_scope'] != 'create'
+        ):
+            # roll back to the snapshot
+            r_error, _, r_debug = self._commit_once(snapshot, 2)
+            if r_error is not None:
+                r_error.debug = r_debug
+                debug['next_stage'] = r_error
+                error = RuntimeError()
+            else:
+                self.ipdb.routes.gc()
 
         if drop and notx:
             self.drop(transaction.uid)
@@ -581,7 +691,7 @@ class BaseRoute(Transactional):
         if self.get('family') == AF_MPLS:
             table = 'mpls'
         else:
-            table = self.get('table', 254)
+            table = self.get('table') or RT_TABLE_MAIN
         del self.ipdb.routes.tables[table][self.make_key(self)]
 
 
@@ -613,64 +723,56 @@ class Route(BaseRoute):
         '''
         Construct from a netlink message a multipath nexthop key
         '''
-        values = []
         if isinstance(msg, nlmsg_base):
-            for field in IPNHKey._fields:
-                v = msg.get_attr(msg.name2nla(field))
-                if field == 'encap':
-                    # 1. encap type
-                    if msg.get_attr('RTA_ENCAP_TYPE') != 1:  # FIXME
-                        values.append(None)
-                        continue
-                    # 2. encap_type == 'mpls'
-                    v = '/'.join(
+            gateway = msg.get_attr('RTA_GATEWAY')
+            if gateway is None:
+                gateway = msg.get('gateway', None)
+            # 1. encap type
+            if msg.get_attr('RTA_ENCAP_TYPE') != 1:  # FIXME
+                encap = None
+            # 2. encap_type == 'mpls'
+            else:
+                encap = _intern(
+                    '/'.join(
                         [
                             str(x['label'])
-                            for x in v.get_attr('MPLS_IPTUNNEL_DST')
+                            for x in msg.get_attr('RTA_ENCAP').get_attr(
+                                'MPLS_IPTUNNEL_DST'
+                            )
                         ]
                     )
-                elif v is None:
-                    v = msg.get(field, None)
-                values.append(v)
+                )
+            oif = msg.get_attr('RTA_OIF')
+            if oif is None:
+                oif = msg.get('oif', None)
         elif isinstance(msg, dict):
-            for field in IPNHKey._fields:
-                v = msg.get(field, None)
-                if field == 'encap' and v and v['labels']:
-                    v = v['labels']
-                elif (field == 'encap') and (
-                    len(msg.get('multipath', []) or []) == 1
-                ):
-                    v = (
-                        tuple(msg['multipath'].raw.values())[0]
-                        .get('encap', {})
-                        .get('labels', None)
-                    )
-                elif field == 'encap':
-                    v = None
-                elif (
-                    (field == 'gateway')
-                    and (len(msg.get('multipath', []) or []) == 1)
-                    and not v
-                ):
-                    v = tuple(msg['multipath'].raw.values())[0].get(
-                        'gateway', None
-                    )
-
-                if field == 'encap' and isinstance(v, (list, tuple, set)):
-                    v = '/'.join(
-                        map(
-                            lambda x: (
-                                str(x['label'])
-                                if isinstance(x, dict)
-                                else str(x)
-                            ),
-                            v,
-                        )
+            gateway = msg.get('gateway', None)
+            encap = msg.get('encap', None)
+            if len(msg.get('multipath', []) or []) == 1:
+                nh = next(iter(msg['multipath'].raw.values()))
+            else:
+                nh = None
+            if encap and encap['labels']:
+                encap = encap['labels']
+            elif nh is not None:
+                encap = nh.get('encap', {}).get('labels', None)
+            else:
+                encap = None
+            if nh is not None and not gateway:
+                gateway = nh.get('gateway', None)
+            if isinstance(encap, (list, tuple, set)):
+                encap = '/'.join(
+                    map(
+                        lambda x: (
+                            str(x['label']) if isinstance(x, dict) else str(x)
+                        ),
+                        encap,
                     )
-                values.append(v)
+                )
+            oif = msg.get('oif', None)
         else:
             raise TypeError('prime not supported: %s' % type(msg))
-        return IPNHKey(*values)
+        return IPNHKey(gateway, encap, oif)
 
     @classmethod
     def make_key(cls, msg):
@@ -678,44 +780,58 @@ class Route(BaseRoute):
         Construct from a netlink message a key that can be used
         to locate the route in the table
         '''
-        values = []
         if isinstance(msg, nlmsg_base):
-            for field in RouteKey._fields:
-                v = msg.get_attr(msg.name2nla(field))
-                if field == 'dst':
-                    if v is not None:
-                        v = '%s/%s' % (v, msg['dst_len'])
-                    else:
-                        v = 'default'
-                elif field == 'tos' and msg.get('family') != AF_INET:
-                    # ignore tos field for non-IPv6 routes,
-                    # as it used as a key only there
-                    v = None
-                elif v is None:
-                    v = msg.get(field, None)
-                values.append(v)
+            # the key depends only on the message, so it is
+            # calculated once and stored on the message object
+            ret = getattr(msg, '_ipdb_route_key', None)
+            if ret is not None:
+                return ret
+            # only dst, table and priority may come as NLA,
+            # family and tos are rtmsg fields
+            family = msg.get('family', None)
+            dst = msg.get_attr('RTA_DST')
+            if dst is not None:
+                dst = _intern('%s/%s' % (dst, msg['dst_len']))
+            else:
+                dst = 'default'
+            table = msg.get_attr('RTA_TABLE')
+            if table is None:
+                table = msg.get('table', None)
+            priority = msg.get_attr('RTA_PRIORITY')
+            if priority is None:
+                priority = msg.get('priority', None)
+            # ignore tos field for non-IPv4 routes,
+            # as it used as a key only there
+            tos = msg.get('tos', None) if family == AF_INET else None
+            ret = RouteKey(dst, table, family, priority, tos)
+            try:
+                msg._ipdb_route_key = ret
+            except AttributeError:
+                # no __dict__ in the message class
+                pass
+            return ret
         elif isinstance(msg, dict):
-            for field in RouteKey._fields:
-                v = msg.get(field, None)
-                if (
-                    field == 'dst'
-                    and isinstance(v, basestring)
-                    and v.find(':') > -1
-                ):
-                    v = v.split('/')
-                    ip = inet_ntop(AF_INET6, inet_pton(AF_INET6, v[0]))
-                    if len(v) > 1:
-                        v = '%s/%s' % (ip, v[1])
-                    else:
-                        v = ip
-                elif field == 'tos' and msg.get('family') != AF_INET:
-                    # ignore tos field for non-IPv6 routes,
-                    # as it used as a key only there
-                    v = None
-                values.append(v)
+            family = msg.get('family', None)
+            dst = msg.get('dst', None)
+            if isinstance(dst, basestring) and dst.find(':') > -1:
+                dst = dst.split('/')
+                ip = inet_ntop(AF_INET6, inet_pton(AF_INET6, dst[0]))
+                if len(dst) > 1:
+                    dst = _intern('%s/%s' % (ip, dst[1]))
+                else:
+                    dst = _intern(ip)
+            # ignore tos field for non-IPv4 routes,
+            # as it used as a key only there
+            tos = msg.get('tos', None) if family == AF_INET else None
+            return RouteKey(
+                dst,
+                msg.get('table', None),
+                family,
+                msg.get('priority', None),
+                tos,
+            )
         else:
             raise TypeError('prime not supported: %s' % type(msg))
-        return RouteKey(*values)
 
     def __setitem__(self, key, value):
         ret = value
@@ -757,11 +873,7 @@ class Route(BaseRoute):
             cur = Transactional.__getitem__(self, key)
             if isinstance(cur, NextHopSet):
                 # load entries
-                vs = NextHopSet(value)
-                for key in vs - cur:
-                    cur.add(key)
-                for key in cur - vs:
-                    cur.remove(key)
+                cur.sync(value)
             else:
                 # drop any result of `update()`
                 Transactional.__setitem__(self, key, NextHopSet(value))
@@ -812,6 +924,10 @@ class MPLSRoute(BaseRoute):
         '''
         ret = None
         if isinstance(msg, nlmsg):
+            # the key is cached on the message, see Route.make_key()
+            ret = getattr(msg, '_ipdb_mpls_key', None)
+            if ret is not None:
+                return ret
             ret = msg.get_attr('RTA_DST')
         elif isinstance(msg, dict):
             ret = msg.get('dst', None)
@@ -819,6 +935,12 @@ class MPLSRoute(BaseRoute):
             raise TypeError('prime not supported')
         if isinstance(ret, list):
             ret = ret[0]['label']
+        if isinstance(msg, nlmsg):
+            try:
+                msg._ipdb_mpls_key = ret
+            except AttributeError:
+                # no __dict__ in the message class
+                pass
         return ret
 
     def __setitem__(self, key, value):
@@ -853,11 +975,7 @@ class MPLSRoute(BaseRoute):
             cur = BaseRoute.__getitem__(self, key)
             if isinstance(cur, NextHopSet):
                 # load entries
-                vs = NextHopSet(value)
-                for key in vs - cur:
-                    cur.add(key)
-                for key in cur - vs:
-                    cur.remove(key)
+                cur.sync(value)
             else:
                 BaseRoute.__setitem__(self, key, NextHopSet(value))
         else:
@@ -876,44 +994,361 @@ class MPLSRoute(BaseRoute):
 
 
 class RoutingTable(object):
+    __slots__ = (
+        'ipdb',
+        'lock',
+        'idx',
+        'kdx',
+        '_keys',
+        '_cols',
+        '_pos',
+        '_gaps',
+        '_by',
+        '_unindexed',
+        '_by_family',
+        '_version',
+        '_gc_keys',
+        '_keys_cache',
+        '_prefixes',
+    )
     route_class = Route
+    # route fields to maintain secondary indexes for, see filter()
+    indexed_fields = ('dst', 'oif', 'gateway')
+    # route fields to store in columns, see filter()
+    column_fields = indexed_fields + ('family', 'table')
+    # route fields to index on the first filter() by them; only the
+    # selective ones, as e.g. proto, scope or type have usually one
+    # value for the whole table, and the index would not narrow it
+    lazy_indexed_fields = ('iif',)
 
     def __init__(self, ipdb, prime=None):
         self.ipdb = ipdb
         self.lock = threading.Lock()
         self.idx = {}
         self.kdx = {}
+        # columns: keys and route fields in the idx order; removed
+        # records leave None in the keys column until compacted
+        self._keys = []
+        self._cols = dict([(x, []) for x in self.column_fields])
+        self._pos = {}
+        self._gaps = 0
+        # secondary indexes: field -> value -> set of keys
+        self._by = dict([(x, {}) for x in self.indexed_fields])
+        # keys with unhashable values, can not be indexed
+        self._unindexed = set()
+        # family -> {key: dst}, in the idx order, see _values()
+        self._by_family = {}
+        # bumped on every change of the records set or their
+        # gc state, used to validate caches built on the table
+        self._version = 0
+        # keys of the records marked for gc, see gc()
+        self._gc_keys = set()
+        # family -> (version, dst list), see RoutingTableSet.keys()
+        self._keys_cache = {}
+        # family -> prefix length -> network -> set of keys,
+        # built on the first lookup(), see _prefix()
+        self._prefixes = None
 
     def __nogc__(self):
-        return self.filter(lambda x: x['route']['ipdb_scope'] != 'gc')
+        # a comprehension, not filter() with a lambda: no Python
+        # function call per record
+        return [
+            x
+            for x in tuple(self.idx.values())
+            if x['route']['ipdb_scope'] != 'gc'
+        ]
 
     def __repr__(self):
         return repr([x['route'] for x in self.__nogc__()])
 
     def __len__(self):
-        return len(self.keys())
+        with self.lock:
+            return len(self.__nogc__())
 
     def __iter__(self):
         for record in self.__nogc__():
             yield record['route']
 
+    def _link(self, key, record):
+        '''
+        Register the record in the idx, columns and indexes
+        '''
+        route = record['route']
+        family = route.get('family')
+        pos = self._pos.get(key)
+        if pos is None:
+            pos = self._pos[key] = len(self._keys)
+            self._keys.append(key)
+            for column in self._cols.values():
+                column.append(None)
+        else:
+            if self._cols['family'][pos] != family:
+                self._unfamily(key, pos)
+            self._unindex(key, pos)
+        # updating an existing entry keeps its position in
+        # the bucket, the same as in the idx
+        self._by_family.setdefault(family, {})[key] = route.get('dst')
+        self._version += 1
+        self.idx[key] = record
+        if self._prefixes is not None:
+            self._prefix_add(key)
+        if record['route'].get('ipdb_scope') == 'gc':
+            self._gc_keys.add(key)
+        else:
+            self._gc_keys.discard(key)
+        for field, column in self._cols.items():
+            value = column[pos] = record['route'].get(field)
+            if field in self._by:
+                try:
+                    self._by[field].setdefault(value, set()).add(key)
+                except TypeError:
+                    self._unindexed.add(key)
+
+    def _unlink(self, key):
+        '''
+        Drop the record from the idx, columns and indexes
+        '''
+        record = self.idx.pop(key)
+        pos = self._pos.pop(key)
+        self._version += 1
+        self._gc_keys.discard(key)
+        if self._prefixes is not None:
+            self._prefix_del(key)
+        self._unfamily(key, pos)
+        self._unindex(key, pos)
+        self._keys[pos] = None
+        for column in self._cols.values():
+            column[pos] = None
+        self._gaps += 1
+        if self._gaps > len(self._keys) // 2:
+            self._compact()
+        return record
+
+    def _unindex(self, key, pos):
+        for field, index in self._by.items():
+            value = self._cols[field][pos]
+            try:
+                bucket = index.get(value)
+            except TypeError:
+                continue
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del index[value]
+        self._unindexed.discard(key)
+
+    def _unfamily(self, key, pos):
+        family = self._cols['family'][pos]
+        bucket = self._by_family.get(family)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self._by_family[family]
+
+    def _index_field(self, field):
+        '''
+        Start to maintain a column and an index for the field
+        '''
+        column = []
+        index = {}
+        for key in self._keys:
+            value = None
+            if key is not None:
+                value = self.idx[key]['route'].get(field)
+                try:
+                    index.setdefault(value, set()).add(key)
+                except TypeError:
+                    self._unindexed.add(key)
+            column.append(value)
+        self._cols[field] = column
+        self._by[field] = index
+
+    @staticmethod
+    def _prefix(key):
+        '''
+        Return (family, prefix length, network bits) for an IP route
+        key, or None for other keys
+        '''
+        if not isinstance(key, RouteKey):
+            return None
+        family = key.family
+        dst = key.dst
+        if family == AF_INET:
+            bits = 32
+        elif family == AF_INET6:
+            bits = 128
+        else:
+            return None
+        if dst == 'default':
+            return (family, 0, 0)
+        if not isinstance(dst, basestring):
+            return None
+        addr, _, plen = dst.partition('/')
+        plen = int(plen) if plen else bits
+        net = int.from_bytes(inet_pton(family, addr), 'big')
+        return (family, plen, net >> (bits - plen))
+
+    def _prefix_add(self, key):
+        prefix = self._prefix(key)
+        if prefix is not None:
+            family, plen, net = prefix
+            (
+                self._prefixes.setdefault(family, {})
+                .setdefault(plen, {})
+                .setdefault(net, set())
+                .add(key)
+            )
+
+    def _prefix_del(self, key):
+        prefix = self._prefix(key)
+        if prefix is None:
+            return
+        family, plen, net = prefix
+        lengths = self._prefixes.get(family, {})
+        nets = lengths.get(plen, {})
+        keys = nets.get(net)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del nets[net]
+                if not nets:
+                    del lengths[plen]
+
+    def lookup(self, addr):
+        '''
+        Longest prefix match: return the record of the most specific
+        route covering the address; among the routes to the same
+        prefix the one with the lowest priority wins. Routes marked
+        for gc are skipped, as in keys() and iteration.
+
+        Raise ValueError if addr is not an IPv4 or IPv6 address.
+        '''
+        if not isinstance(addr, basestring):
+            raise ValueError('invalid address: %r' % (addr,))
+        if addr.find(':') > -1:
+            family, bits = AF_INET6, 128
+        else:
+            family, bits = AF_INET, 32
+        try:
+            value = int.from_bytes(inet_pton(family, addr), 'big')
+        except OSError:
+            raise ValueError('invalid address: %r' % (addr,))
+        with self.lock:
+            if self._prefixes is None:
+                self._prefixes = {}
+                for key in self.idx:
+                    self._prefix_add(key)
+            lengths = self._prefixes.get(family, {})
+            pos = self._pos
+            gc = self._gc_keys
+            idx = self.idx
+            for plen in sorted(lengths, reverse=True):
+                keys = [
+                    x
+                    for x in lengths[plen].get(value >> (bits - plen), ())
+                    if x not in gc or idx[x]['route']['ipdb_scope'] != 'gc'
+                ]
+                if keys:
+                    key = min(keys, key=lambda x: (x.priority or 0, pos[x]))
+                    return idx[key]
+        raise KeyError('record not found')
+
+    def _compact(self):
+        alive = [i for i, x in enumerate(self._keys) if x is not None]
+        self._keys = [self._keys[i] for i in alive]
+        for field, column in tuple(self._cols.items()):
+            self._cols[field] = [column[i] for i in alive]
+        self._pos = dict([(x, i) for i, x in enumerate(self._keys)])
+        self._gaps = 0
+
     def gc(self):
+        # check only the records marked for gc, not the whole table
+        if not self._gc_keys:
+            return
         now = time.time()
-        for route in self.filter({'ipdb_scope': 'gc'}):
-            if now - route['route']._gctime < 2:
-                continue
+        for key in tuple(self._gc_keys):
+            with self.lock:
+                route = self.idx.get(key)
+                if route is None or route['route']['ipdb_scope'] != 'gc':
+                    self._gc_keys.discard(key)
+                    continue
+                if now - route['route']._gctime < 2:
+                    continue
+                self._gc_keys.discard(key)
+            # no lock for the netlink request
             try:
                 if not self.ipdb.nl.route('dump', **route['route']):
                     raise
                 with route['route']._direct_state:
                     route['route']['ipdb_scope'] = 'system'
+                with self.lock:
+                    self._version += 1
             except:
-                del self.idx[route['key']]
+                with self.lock:
+                    # the record may be gone or replaced meanwhile
+                    if self.idx.get(key) is route:
+                        self._unlink(key)
 
     def keys(self, key='dst'):
+        if key in self._cols:
+            return self._values(key)
         with self.lock:
             return [x['route'][key] for x in self.__nogc__()]
 
+    def _values(self, field, family=AF_UNSPEC):
+        '''
+        Scan the field column (and the family one, if requested)
+        instead of the route objects; skip the records marked for gc
+        '''
+        with self.lock:
+            column = self._cols[field]
+            if field == 'dst' and family != AF_UNSPEC:
+                bucket = self._by_family.get(family, {})
+                if not self._gc_keys:
+                    return list(bucket.values())
+                gc = self._gc_keys
+                idx = self.idx
+                return [
+                    value
+                    for key, value in bucket.items()
+                    if key not in gc or idx[key]['route']['ipdb_scope'] != 'gc'
+                ]
+            if not self._gc_keys:
+                # no need to check the records, select in C
+                if family != AF_UNSPEC:
+                    # removed records have None in the family column
+                    return list(
+                        compress(
+                            column,
+                            map(eq, repeat(family), self._cols['family']),
+                        )
+                    )
+                if not self._gaps:
+                    return list(column)
+                # removed records have None in the keys column; MPLS
+                # keys are labels, and label 0 is a valid one
+                return list(
+                    compress(column, map(is_not, self._keys, repeat(None)))
+                )
+            gc = self._gc_keys
+            idx = self.idx
+            if family == AF_UNSPEC:
+                rows = zip(self._keys, column)
+            else:
+                rows = (
+                    (key, value)
+                    for key, value, x in zip(
+                        self._keys, column, self._cols['family']
+                    )
+                    if x == family
+                )
+            return [
+                value
+                for key, value in rows
+                if key is not None
+                and (key not in gc or idx[key]['route']['ipdb_scope'] != 'gc')
+            ]
+
     def items(self):
         for key in self.keys():
             yield (key, self[key])
@@ -929,18 +1364,94 @@ class RoutingTable(object):
         if not isinstance(target, dict):
             raise TypeError('target type not supported: %s' % type(target))
 
+        # compile the target into one getter and the values to match
+        keys = tuple(target)
+        if not keys:
+            ret = list(self._candidates(target))
+            return ret[:1] if oneshot else ret
+        match = itemgetter(*keys)
+        if len(keys) == 1:
+            expected = target[keys[0]]
+        else:
+            expected = tuple([target[x] for x in keys])
+
         ret = []
-        for record in tuple(self.idx.values()):
-            for key, value in tuple(target.items()):
-                if (key not in record['route']) or (
-                    value != record['route'][key]
-                ):
-                    break
+        for record in self._candidates(target):
+            try:
+                if match(record['route']) != expected:
+                    continue
+            except KeyError:
+                continue
+            ret.append(record)
+            if oneshot:
+                return ret
+
+        return ret
+
+    def _candidates(self, target):
+        #
+        # narrow down the records to check in filter():
+        #
+        # 1. by the indexed fields in the target
+        # 2. or by the column fields
+        # 3. or return all the records
+        #
+        bucket = None
+        match = []
+        for field, value in tuple(target.items()):
+            if field in self.lazy_indexed_fields and field not in self._by:
+                # build the index under the lock; describe() calls
+                # filter() with the lock held already, and the lock
+                # is not reentrant, so then just skip it this time
+                if self.lock.acquire(False):
+                    try:
+                        if field not in self._by:
+                            self._index_field(field)
+                    finally:
+                        self.lock.release()
+            if field in self._by:
+                try:
+                    keys = self._by[field].get(value, frozenset())
+                except TypeError:
+                    continue
+                if bucket is None:
+                    bucket = keys
+                else:
+                    bucket = bucket.intersection(keys)
+            elif field in self._cols:
+                match.append((field, value))
+        if bucket is not None:
+            if self._unindexed:
+                bucket = self._unindexed.union(bucket)
+            keys = self._keys
+            if len(bucket) * 4 > len(keys):
+                # a large share of the table: walk the keys in the
+                # idx order instead of sorting the bucket
+                keys = list(filter(bucket.__contains__, keys))
             else:
+                pos = self._pos
+                keys = sorted(bucket, key=lambda x: pos.get(x, -1))
+        elif match:
+            # _compact() replaces the columns and the keys, so scan
+            # them under the lock; if the lock is taken, e.g. by
+            # describe(), check all the records instead
+            if not self.lock.acquire(False):
+                return tuple(self.idx.values())
+            try:
+                values = tuple([x[1] for x in match])
+                rows = zip(*[self._cols[x[0]] for x in match])
+                keys = [
+                    key for key, row in zip(self._keys, rows) if row == values
+                ]
+            finally:
+                self.lock.release()
+        else:
+            return tuple(self.idx.values())
+        ret = []
+        for key in keys:
+            record = self.idx.get(key)
+            if record is not None:
                 ret.append(record)
-                if oneshot:
-                    return ret
-
         return ret
 
     def describe(self, target, forward=False):
@@ -950,6 +1461,15 @@ class RoutingTable(object):
             keys = [x['key'] for x in self.__nogc__()]
             return self.idx[keys[target]]
 
+        # match the route by dst with the dst index, the same
+        # as filter() does, but with no target dict and sorting
+        if isinstance(target, basestring) and not self._unindexed:
+            keys = self._by['dst'].get(target)
+            if keys:
+                return self.idx[min(keys, key=self._pos.__getitem__)]
+            if not forward:
+                raise KeyError('record not found')
+
         # match the route by key
         if isinstance(target, (tuple, list)):
             # full match
@@ -992,7 +1512,7 @@ class RoutingTable(object):
     def __delitem__(self, key):
         with self.lock:
             item = self.describe(key, forward=False)
-            del self.idx[self.route_class.make_key(item['route'])]
+            self._unlink(self.route_class.make_key(item['route']))
 
     def load(self, msg):
         key = self.route_class.make_key(msg)
@@ -1015,12 +1535,13 @@ class RoutingTable(object):
                     record['route'].update(value)
 
             key = self.route_class.make_key(record['route'])
-            if record['key'] is None:
-                self.idx[key] = {'route': record['route'], 'key': key}
+            old_key = record['key']
+            if old_key is None:
+                self._link(key, {'route': record['route'], 'key': key})
             else:
-                self.idx[key] = record
-                if record['key'] != key:
-                    del self.idx[record['key']]
+                self._link(key, record)
+                if old_key != key:
+                    self._unlink(old_key)
                     record['key'] = key
 
     def __getitem__(self, key):
@@ -1028,6 +1549,9 @@ class RoutingTable(object):
             return self.describe(key, forward=False)['route']
 
     def __contains__(self, key):
+        # a direct idx hit for the route keys, no lock needed
+        if type(key) is RouteKey:
+            return key in self.idx
         try:
             with self.lock:
                 self.describe(key, forward=False)
@@ -1037,8 +1561,12 @@ class RoutingTable(object):
 
 
 class MPLSTable(RoutingTable):
+    __slots__ = ()
     route_class = MPLSRoute
 
+    def __len__(self):
+        return len(self.idx)
+
     def keys(self):
         return self.idx.keys()
 
@@ -1055,11 +1583,29 @@ class MPLSTable(RoutingTable):
 
 
 class RoutingTableSet(object):
+    __slots__ = (
+        'ipdb',
+        '_gctime',
+        'ignore_rtables',
+        'tables',
+        '_main_table',
+        '_last_table',
+        '_table_arr',
+        '_event_map',
+    )
+
     def __init__(self, ipdb):
         self.ipdb = ipdb
         self._gctime = time.time()
         self.ignore_rtables = ipdb._ignore_rtables or []
-        self.tables = {254: RoutingTable(self.ipdb)}
+        self.tables = {RT_TABLE_MAIN: RoutingTable(self.ipdb)}
+        # the main table is never re-created, keep a direct reference
+        self._main_table = self.tables[RT_TABLE_MAIN]
+        # (table id, table) of the last get() from a non-main table
+        self._last_table = (RT_TABLE_MAIN, self._main_table)
+        # tables 0..255 by id, faster to look up than the dict
+        self._table_arr = [None] * 256
+        self._table_arr[RT_TABLE_MAIN] = self._main_table
         self._event_map = {
             'RTM_NEWROUTE': self.load_netlink,
             'RTM_DELROUTE': self.load_netlink,
@@ -1087,14 +1633,17 @@ class RoutingTableSet(object):
         Create a route from a dictionary
         '''
         spec = dict(spec or kwarg)
+        return self._add(spec, spec.get('dst') or '')
+
+    def _add(self, spec, dst):
+        # spec is a private copy here, dst is extracted already
         gateway = spec.get('gateway') or ''
-        dst = spec.get('dst') or ''
         if 'tos' not in spec:
             spec['tos'] = 0
         if 'scope' not in spec:
             spec['scope'] = 0
         if 'table' not in spec:
-            spec['table'] = 254
+            spec['table'] = RT_TABLE_MAIN
         if 'family' not in spec:
             if (dst.find(':') > -1) or (gateway.find(':') > -1):
                 spec['family'] = AF_INET6
@@ -1119,14 +1668,13 @@ class RoutingTableSet(object):
         multipath = spec.pop('multipath', [])
         if spec.get('family', 0) == AF_MPLS:
             table = 'mpls'
-            if table not in self.tables:
-                self.tables[table] = MPLSTable(self.ipdb)
             route = MPLSRoute(self.ipdb)
         else:
-            table = spec.get('table', 254)
-            if table not in self.tables:
-                self.tables[table] = RoutingTable(self.ipdb)
+            table = spec.get('table', RT_TABLE_MAIN)
             route = Route(self.ipdb)
+        rtable = self.tables.get(table)
+        if rtable is None:
+            rtable = self._new_table(table)
         route.update(spec)
         with route._direct_state:
             route['ipdb_scope'] = 'create'
@@ -1142,7 +1690,7 @@ class RoutingTableSet(object):
                 route[key] = route.make_encap(value)
             else:
                 route[key] = value
-        self.tables[table][route.make_key(route)] = route
+        rtable[route.make_key(route)] = route
         return route
 
     def load_netlink(self, msg):
@@ -1169,7 +1717,7 @@ class RoutingTableSet(object):
         if msg['event'] == 'RTM_DELROUTE':
             try:
                 # locate the record
-                record = self.tables[table][msg]
+                record = self._find_table(table)[msg]
                 # delete the record
                 if record['ipdb_scope'] not in ('locked', 'shadow'):
                     del self.tables[table][msg]
@@ -1181,12 +1729,35 @@ class RoutingTableSet(object):
             return
 
         # RTM_NEWROUTE
-        if table not in self.tables:
-            if table == 'mpls':
-                self.tables[table] = MPLSTable(self.ipdb)
-            else:
-                self.tables[table] = RoutingTable(self.ipdb)
-        self.tables[table].load(msg)
+        #
+        # a dict.setdefault() here would create a table object
+        # for every message
+        rtable = self._find_table(table)
+        if rtable is None:
+            rtable = self._new_table(table)
+        rtable.load(msg)
+
+    def _find_table(self, table):
+        # table ids from the kernel are never negative, so
+        # the array index is safe here; 'mpls' and ids > 255
+        # go to the dict
+        try:
+            rtable = self._table_arr[table]
+        except (IndexError, TypeError):
+            return self.tables.get(table)
+        if rtable is None:
+            return self.tables.get(table)
+        return rtable
+
+    def _new_table(self, table):
+        if table == 'mpls':
+            rtable = MPLSTable(self.ipdb)
+        else:
+            rtable = RoutingTable(self.ipdb)
+        self.tables[table] = rtable
+        if isinstance(table, int) and 0 <= table < 256:
+            self._table_arr[table] = rtable
+        return rtable
 
     def gc_mark_addr(self, msg):
         ##
@@ -1240,6 +1811,7 @@ class RoutingTableSet(object):
                         with record['route']._direct_state:
                             record['route']['ipdb_scope'] = 'gc'
                             record['route']._gctime = time.time()
+                        self._gc_marked(record)
 
         elif family == AF_INET6:
             # Unlike IPv4, IPv6 route updates are sent after addr
@@ -1260,64 +1832,92 @@ class RoutingTableSet(object):
             with record['route']._direct_state:
                 record['route']['ipdb_scope'] = 'gc'
                 record['route']._gctime = time.time()
+            self._gc_marked(record)
         for record in self.filter({'iif': msg['index']}):
             with record['route']._direct_state:
                 record['route']['ipdb_scope'] = 'gc'
                 record['route']._gctime = time.time()
+            self._gc_marked(record)
+
+    def _gc_marked(self, record):
+        # let the record's table know, see RoutingTable.gc()
+        key = record['key']
+        for rtable in tuple(self.tables.values()):
+            if rtable is None:
+                continue
+            with rtable.lock:
+                if rtable.idx.get(key) is record:
+                    rtable._gc_keys.add(key)
+                    rtable._version += 1
 
     def gc(self):
-        for table in self.tables.keys():
-            self.tables[table].gc()
+        for table in tuple(self.tables.values()):
+            if table is not None:
+                table.gc()
 
     def remove(self, route, table=None):
         if isinstance(route, Route):
-            table = route.get('table', 254) or 254
-            route = route.get('dst', 'default')
-        else:
-            table = table or 254
-        self.tables[table][route].remove()
+            # the route object is at hand, no need to look it up
+            route.remove()
+            return
+        rtable = self.tables[table] if table else self._main_table
+        rtable[route].remove()
 
     def filter(self, target):
-        # FIXME: turn into generator!
-        ret = []
-        for table in tuple(self.tables.values()):
-            if table is not None:
-                ret.extend(table.filter(target))
-        return ret
+        return chain.from_iterable(
+            table.filter(target)
+            for table in tuple(self.tables.values())
+            if table is not None
+        )
 
-    def describe(self, spec, table=254):
+    def describe(self, spec, table=RT_TABLE_MAIN):
         return self.tables[table].describe(spec)
 
     def get(self, dst, table=None):
-        table = table or 254
-        return self.tables[table][dst]
-
-    def keys(self, table=254, family=AF_UNSPEC):
-        return [
-            x['dst']
-            for x in self.tables[table]
-            if (x.get('family') == family) or (family == AF_UNSPEC)
-        ]
-
-    def has_key(self, key, table=254):
+        if not table:
+            return self._main_table[dst]
+        # the tuple is replaced at once, so it is safe to share
+        last = self._last_table
+        if last[0] != table:
+            last = self._last_table = (table, self.tables[table])
+        return last[1][dst]
+
+    def lookup(self, addr, table=None):
+        '''
+        Return the route to the address by the longest prefix match
+        '''
+        rtable = self.tables[table] if table else self._main_table
+        return rtable.lookup(addr)['route']
+
+    def keys(self, table=RT_TABLE_MAIN, family=AF_UNSPEC):
+        rtable = self.tables[table]
+        version = rtable._version
+        cached = rtable._keys_cache.get(family)
+        if cached is None or cached[0] != version:
+            ret = rtable._values('dst', family)
+            cached = rtable._keys_cache[family] = (version, ret)
+        return list(cached[1])
+
+    def has_key(self, key, table=RT_TABLE_MAIN):
         return key in self.tables[table]
 
     def __contains__(self, key):
-        return key in self.tables[254]
+        return key in self._main_table
 
     def __getitem__(self, key):
-        return self.get(key)
+        return self._main_table[key]
 
     def __setitem__(self, key, value):
-        if key != value['dst']:
+        dst = value['dst']
+        if key != dst:
             raise ValueError("dst doesn't match key")
-        return self.add(value)
+        return self._add(dict(value), dst or '')
 
     def __delitem__(self, key):
         return self.remove(key)
 
     def __repr__(self):
-        return repr(self.tables[254])
+        return repr(self._main_table)
 
 
 spec = [{'name': 'routes', 'class': RoutingTableSet, 'kwarg': {}}]
@@ -88,6 +88,8 @@ class Transactional(Dotkeys):
     '''
 
     _fields = []
+    # optional frozenset of _fields for faster membership tests
+    _fields_set = None
     _virtual_fields = []
     _fields_cmp = {}
     _linked_sets = []
@@ -174,9 +176,10 @@ class Transactional(Dotkeys):
             res = self.__class__(
                 ipdb=self.ipdb, mode='snapshot', parent=parent, uid=uid
             )
+            fields = self._fields_set or self._fields
             for key, value in self.items():
                 if self[key] is not None:
-                    if key in self._fields:
+                    if key in fields:
                         res[key] = self[key]
             for key in self._linked_sets:
                 res[key] = type(self[key])(self[key])
@@ -224,10 +227,11 @@ class Transactional(Dotkeys):
         # create result
         res = {}
 
+        fields = self._fields_set or self._fields
         with self._direct_state:
             # simple keys
             for key in self:
-                if key in self._fields:
+                if key in fields:
                     if (key not in vs) or (self[key] != vs[key]):
                         res[key] = self[key]
         for key in self._linked_sets:
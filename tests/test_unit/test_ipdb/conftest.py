@@ -0,0 +1,84 @@
+from socket import AF_INET, AF_INET6
+
+import pytest
+
+from pyroute2.common import AF_MPLS
+from pyroute2.ipdb.routes import RoutingTableSet
+from pyroute2.netlink.rtnl import RTM_DELROUTE, RTM_NEWROUTE
+from pyroute2.netlink.rtnl.rtmsg import rtmsg
+
+
+class MockNetlink(object):
+    '''
+    No routes in the system: every dump returns nothing
+    '''
+
+    def route(self, *argv, **kwarg):
+        return []
+
+
+class MockIPDB(object):
+    mode = 'implicit'
+    txdrop = False
+    _ignore_rtables = []
+    _stop = False
+
+    def __init__(self):
+        self.nl = MockNetlink()
+
+
+def make_route(
+    dst=None,
+    dst_len=None,
+    event='RTM_NEWROUTE',
+    table=254,
+    family=None,
+    **attrs
+):
+    '''
+    Make a decoded rtmsg like the ones IPDB gets from the kernel;
+    no dst means the default route, MPLS dst is a list of labels
+    '''
+    if family is None:
+        family = AF_INET6 if dst and dst.find(':') > -1 else AF_INET
+    if dst_len is None:
+        dst_len = 32 if family == AF_INET else 128
+    msg = rtmsg()
+    msg['family'] = family
+    msg['dst_len'] = dst_len if dst else 0
+    # ids above 255 go only to RTA_TABLE, like the kernel does
+    msg['table'] = table if table < 256 else 252
+    msg['proto'] = 3
+    msg['type'] = 1
+    # MPLS routes have no table NLA
+    msg['attrs'] = [] if family == AF_MPLS else [('RTA_TABLE', table)]
+    if dst:
+        msg['attrs'].append(('RTA_DST', dst))
+    for name, value in attrs.items():
+        msg['attrs'].append((name, value))
+    msg.encode()
+    ret = rtmsg(msg.data)
+    ret.decode()
+    ret['header']['type'] = (
+        RTM_NEWROUTE if event == 'RTM_NEWROUTE' else RTM_DELROUTE
+    )
+    ret['event'] = event
+    return ret
+
+
+@pytest.fixture
+def route_msg():
+    '''
+    The route message factory, see make_route()
+    '''
+    yield make_route
+
+
+@pytest.fixture
+def routes():
+    '''
+    RoutingTableSet fed with rtmsg objects, no kernel needed
+    '''
+    ipdb = MockIPDB()
+    ipdb.routes = RoutingTableSet(ipdb)
+    yield ipdb.routes
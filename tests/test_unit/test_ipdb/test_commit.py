@@ -0,0 +1,127 @@
+import pytest
+
+from pyroute2.ipdb.routes import Route, RoutingTableSet
+
+
+class Netlink(object):
+    '''
+    Record the route requests and fail the ones listed in `fail`;
+    the changes are echoed as route events, as the kernel does
+    '''
+
+    def __init__(self, routes, route_msg):
+        self.routes = routes
+        self.route_msg = route_msg
+        self.calls = []
+        self.fail = []
+        self.echo_failed = False
+
+    def route(self, cmd, **kwarg):
+        self.calls.append((cmd, kwarg.get('oif')))
+        failed = cmd in self.fail
+        if failed:
+            self.fail.remove(cmd)
+        if cmd in ('add', 'set') and (self.echo_failed or not failed):
+            self.routes.load_netlink(
+                self.route_msg(
+                    kwarg['dst'].split('/')[0],
+                    kwarg['dst_len'],
+                    RTA_OIF=kwarg['oif'],
+                )
+            )
+        if failed:
+            raise OSError('%s failed' % cmd)
+        return []
+
+
+@pytest.fixture
+def nl(routes, route_msg):
+    routes.ipdb.nl = ret = Netlink(routes, route_msg)
+    yield ret
+
+
+@pytest.fixture
+def phases(monkeypatch):
+    '''
+    Commit phases run by _commit_once(), gc() runs as 'gc'
+    '''
+    ret = []
+    commit_once = Route._commit_once
+    gc = RoutingTableSet.gc
+
+    def _commit_once(self, transaction, commit_phase):
+        ret.append(commit_phase)
+        return commit_once(self, transaction, commit_phase)
+
+    def _gc(self):
+        ret.append('gc')
+        return gc(self)
+
+    monkeypatch.setattr(Route, '_commit_once', _commit_once)
+    monkeypatch.setattr(RoutingTableSet, 'gc', _gc)
+    yield ret
+
+
+@pytest.fixture
+def route(routes, route_msg, nl):
+    routes.load_netlink(route_msg('10.0.0.0', 24, RTA_OIF=1))
+    yield routes['10.0.0.0/24']
+
+
+def test_commit(nl, route, phases):
+    route['oif'] = 2
+    route.commit()
+    assert phases == [1, 'gc']
+    assert nl.calls == [('set', 2)]
+
+
+def test_rollback(nl, route, phases):
+    nl.fail = ['set']
+    route['oif'] = 2
+    with pytest.raises(OSError) as e:
+        route.commit()
+    # one rollback to the snapshot, then gc
+    assert phases == [1, 2, 'gc']
+    assert e.value.debug['next_stage'] is None
+    assert nl.calls == [('set', 2)]
+    assert route['oif'] == 1
+
+
+def test_rollback_error(nl, route, phases):
+    # the kernel takes the changes, but the requests fail
+    nl.fail = ['set', 'set']
+    nl.echo_failed = True
+    route['oif'] = 2
+    with pytest.raises(RuntimeError) as e:
+        route.commit()
+    assert phases == [1, 2]
+    # the rollback error is attached to the commit one
+    stage = e.value.debug['next_stage']
+    assert isinstance(stage, OSError)
+    assert stage.debug['traceback']
+    assert nl.calls == [('set', 2), ('set', 1)]
+
+
+def test_rollback_mask(nl, route, phases):
+    nl.fail = ['set']
+    route['oif'] = 2
+    with pytest.raises(OSError):
+        route.commit(commit_mask=1)
+    assert phases == [1]
+    # the second phase is masked out
+    assert route.commit(commit_phase=2, commit_mask=1) is route
+    assert phases == [1]
+
+
+def test_rollback_create(routes, nl, phases):
+    nl.fail = ['add']
+    route = routes.add({'dst': '10.0.1.0/24', 'oif': 1})
+    assert route['ipdb_scope'] == 'create'
+    with pytest.raises(OSError):
+        route.commit()
+    # nothing to roll back to
+    assert phases == [1]
+    assert nl.calls == [('add', 1)]
+    # global rollbacks skip the route
+    assert route.commit(commit_phase=2) is None
+    assert phases == [1]
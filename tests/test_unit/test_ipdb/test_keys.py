@@ -0,0 +1,81 @@
+from socket import AF_INET
+
+import pytest
+
+from pyroute2.common import AF_MPLS
+from pyroute2.ipdb.routes import IPNHKey, MPLSRoute, RouteKey
+
+values = ('10.0.0.0/24', 254, AF_INET, None, 0)
+
+
+def test_tuple_equality():
+    key = RouteKey(*values)
+    assert key == values
+    assert values == key
+    assert key == RouteKey(*values)
+    assert key != ('10.0.1.0/24',) + values[1:]
+    assert not key != values
+    assert hash(key) == hash(values)
+
+
+def test_dict_lookup():
+    idx = {RouteKey(*values): 'route'}
+    assert idx[values] == 'route'
+    assert idx[RouteKey(**dict(zip(RouteKey._fields, values)))] == 'route'
+    assert {values: 'route'}[RouteKey(*values)] == 'route'
+
+
+def test_tuple_interface():
+    key = RouteKey(*values)
+    assert key.dst == key[0] == '10.0.0.0/24'
+    assert key.table == 254
+    assert key.tos == 0
+    assert key[:2] == ('10.0.0.0/24', 254)
+    assert tuple(key) == values
+    assert len(key) == 5
+    assert key._asdict() == dict(zip(RouteKey._fields, values))
+    assert repr(key) == (
+        "RouteKey(dst='10.0.0.0/24', table=254, family=%r, "
+        "priority=None, tos=0)" % AF_INET
+    )
+
+
+def test_kwarg():
+    key = RouteKey('10.0.0.0/24', 254, family=AF_INET, priority=None, tos=0)
+    assert key == values
+
+
+@pytest.mark.parametrize(
+    'argv,kwarg',
+    (
+        (values[:4], {}),
+        (values[:2], {'family': AF_INET}),
+        (values, {'tos': 0}),
+        (values + (1,), {}),
+        (values, {'foo': 1}),
+    ),
+    ids=['short', 'missing', 'duplicate', 'long', 'unknown'],
+)
+def test_wrong_arguments(argv, kwarg):
+    with pytest.raises(TypeError):
+        RouteKey(*argv, **kwarg)
+
+
+def test_nh_key():
+    key = IPNHKey('10.0.0.1', None, 2)
+    assert key == ('10.0.0.1', None, 2)
+    assert key.gateway == '10.0.0.1'
+    assert key.oif == 2
+    assert key._required == 2
+
+
+def test_mpls_key(route_msg):
+    msg = route_msg([{'label': 0, 'bos': 1}], 20, family=AF_MPLS, RTA_OIF=1)
+    # label 0 is a valid key, and cached as well
+    assert MPLSRoute.make_key(msg) == 0
+    assert msg._ipdb_mpls_key == 0
+    assert MPLSRoute.make_key(msg) == 0
+    assert MPLSRoute.make_key({'dst': [{'label': 16, 'bos': 1}]}) == 16
+    assert MPLSRoute.make_key({'dst': 17}) == 17
+    with pytest.raises(TypeError):
+        MPLSRoute.make_key(17)
@@ -0,0 +1,115 @@
+from socket import AF_INET6
+
+import pytest
+
+
+def load(routes, route_msg, *specs):
+    for dst, dst_len, attrs in specs:
+        routes.load_netlink(route_msg(dst, dst_len, **attrs))
+
+
+def test_longest_prefix(routes, route_msg):
+    load(
+        routes,
+        route_msg,
+        (None, 0, {'RTA_OIF': 1}),
+        ('10.0.0.0', 8, {'RTA_OIF': 2}),
+        ('10.1.0.0', 16, {'RTA_OIF': 3}),
+        ('10.1.2.0', 24, {'RTA_OIF': 4}),
+    )
+    assert routes.lookup('10.1.2.3')['dst'] == '10.1.2.0/24'
+    assert routes.lookup('10.1.9.9')['dst'] == '10.1.0.0/16'
+    assert routes.lookup('10.200.0.1')['dst'] == '10.0.0.0/8'
+    assert routes.lookup('192.168.0.1')['dst'] == 'default'
+
+
+def test_priority(routes, route_msg):
+    load(
+        routes,
+        route_msg,
+        ('10.1.0.0', 16, {'RTA_OIF': 1, 'RTA_PRIORITY': 20}),
+        ('10.1.0.0', 16, {'RTA_OIF': 2, 'RTA_PRIORITY': 10}),
+        ('10.1.0.0', 16, {'RTA_OIF': 3, 'RTA_PRIORITY': 30}),
+    )
+    route = routes.lookup('10.1.2.3')
+    assert route['priority'] == 10
+    assert route['oif'] == 2
+
+
+def test_default(routes, route_msg):
+    load(routes, route_msg, ('10.1.0.0', 16, {'RTA_OIF': 1}))
+    with pytest.raises(KeyError):
+        routes.lookup('192.168.0.1')
+    load(routes, route_msg, (None, 0, {'RTA_GATEWAY': '10.1.0.1'}))
+    route = routes.lookup('192.168.0.1')
+    assert route['dst'] == 'default'
+    assert route['gateway'] == '10.1.0.1'
+    assert routes.lookup('10.1.2.3')['dst'] == '10.1.0.0/16'
+
+
+def test_delroute(routes, route_msg):
+    load(
+        routes,
+        route_msg,
+        ('10.1.0.0', 16, {'RTA_OIF': 1}),
+        ('10.1.2.0', 24, {'RTA_OIF': 1}),
+    )
+    # build the prefix index
+    assert routes.lookup('10.1.2.3')['dst'] == '10.1.2.0/24'
+    routes.load_netlink(
+        route_msg('10.1.2.0', 24, event='RTM_DELROUTE', RTA_OIF=1)
+    )
+    assert routes.lookup('10.1.2.3')['dst'] == '10.1.0.0/16'
+    # routes added after the index is built
+    load(routes, route_msg, ('10.1.2.128', 25, {'RTA_OIF': 1}))
+    assert routes.lookup('10.1.2.129')['dst'] == '10.1.2.128/25'
+    assert routes.lookup('10.1.2.3')['dst'] == '10.1.0.0/16'
+    routes.load_netlink(
+        route_msg('10.1.0.0', 16, event='RTM_DELROUTE', RTA_OIF=1)
+    )
+    with pytest.raises(KeyError):
+        routes.lookup('10.1.2.3')
+
+
+def test_gc(routes, route_msg):
+    load(
+        routes,
+        route_msg,
+        ('10.0.0.0', 8, {'RTA_OIF': 1}),
+        ('10.1.0.0', 16, {'RTA_OIF': 2}),
+    )
+    assert routes.lookup('10.1.2.3')['dst'] == '10.1.0.0/16'
+    # the link goes down, the routes via it are marked for gc
+    routes.gc_mark_link({'family': 0, 'state': 'down', 'index': 2})
+    assert routes.keys() == ['10.0.0.0/8']
+    assert routes.lookup('10.1.2.3')['dst'] == '10.0.0.0/8'
+
+
+def test_ipv6(routes, route_msg):
+    load(
+        routes,
+        route_msg,
+        (None, 0, {'RTA_OIF': 1}),
+        ('fd00::', 16, {'RTA_OIF': 1}),
+        ('fd00:1::', 32, {'RTA_OIF': 1}),
+        ('10.0.0.0', 8, {'RTA_OIF': 1}),
+    )
+    assert routes.lookup('fd00:1::5')['dst'] == 'fd00:1::/32'
+    assert routes.lookup('fd00:2::5')['dst'] == 'fd00::/16'
+    # the IPv4 default route doesn't cover IPv6 addresses
+    with pytest.raises(KeyError):
+        routes.lookup('fe80::1')
+    load(routes, route_msg, (None, 0, {'RTA_OIF': 2, 'family': AF_INET6}))
+    route = routes.lookup('fe80::1')
+    assert route['dst'] == 'default'
+    assert route['family'] == AF_INET6
+    assert route['oif'] == 2
+
+
+@pytest.mark.parametrize(
+    'addr', ('10.0.0.0/24', 'fd00::/64', 'default', '', '10.0.0.256', None, 1)
+)
+def test_invalid(routes, route_msg, addr):
+    load(routes, route_msg, (None, 0, {'RTA_OIF': 1}))
+    with pytest.raises(ValueError):
+        routes.lookup(addr)
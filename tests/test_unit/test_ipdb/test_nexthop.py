@@ -0,0 +1,79 @@
+import pytest
+
+from pyroute2.ipdb.routes import NextHopSet
+
+
+def gateways(nhs):
+    return sorted([x['gateway'] for x in nhs])
+
+
+def test_sub():
+    nhs = NextHopSet(
+        [{'gateway': '10.0.0.1', 'oif': 1}, {'gateway': '10.0.0.2', 'oif': 1}]
+    )
+    other = NextHopSet([{'gateway': '10.0.0.2', 'oif': 1}])
+    assert gateways(nhs - other) == ['10.0.0.1']
+    assert gateways(other - nhs) == []
+    assert gateways(nhs) == ['10.0.0.1', '10.0.0.2']
+
+
+def test_sync():
+    nhs = NextHopSet(
+        [{'gateway': '10.0.0.1', 'oif': 1}, {'gateway': '10.0.0.2', 'oif': 1}]
+    )
+    nhs.sync(
+        [{'gateway': '10.0.0.2', 'oif': 1}, {'gateway': '10.0.0.3', 'oif': 1}]
+    )
+    assert gateways(nhs) == ['10.0.0.2', '10.0.0.3']
+    nhs.sync(NextHopSet([{'gateway': '10.0.0.4', 'oif': 2}]))
+    assert gateways(nhs) == ['10.0.0.4']
+    nhs.sync([])
+    assert len(nhs) == 0
+
+
+def test_sync_empty():
+    nhs = NextHopSet()
+    source = NextHopSet(
+        [{'gateway': '10.0.0.1', 'oif': 1}, {'gateway': '10.0.0.2', 'oif': 1}]
+    )
+    nhs.sync(source)
+    assert gateways(nhs) == ['10.0.0.1', '10.0.0.2']
+    # the source set is not changed or shared
+    nhs.sync([{'gateway': '10.0.0.3', 'oif': 1}])
+    assert gateways(source) == ['10.0.0.1', '10.0.0.2']
+    assert gateways(nhs) == ['10.0.0.3']
+
+
+def test_sync_self():
+    nhs = NextHopSet([{'gateway': '10.0.0.1', 'oif': 1}])
+    nhs.sync(nhs)
+    assert gateways(nhs) == ['10.0.0.1']
+
+
+def test_add_short_key():
+    nhs = NextHopSet([{'gateway': '10.0.0.1'}])
+    # the full nexthop replaces the one with only the required fields
+    nhs.add({'gateway': '10.0.0.1', 'oif': 3})
+    assert [x.get('oif') for x in nhs] == [3]
+
+
+def test_remove_short_key():
+    nhs = NextHopSet(
+        [{'gateway': '10.0.0.1', 'oif': 3}, {'gateway': '10.0.0.2', 'oif': 3}]
+    )
+    # no oif in the spec: fall back to the required fields
+    nhs.remove({'gateway': '10.0.0.1'})
+    assert gateways(nhs) == ['10.0.0.2']
+    with pytest.raises(KeyError):
+        nhs.remove({'gateway': '10.0.0.1'})
+    nhs.remove({'gateway': '10.0.0.2', 'oif': 3})
+    assert len(nhs) == 0
+    assert nhs._by_skey == {}
+
+
+def test_remove_short_key_readd():
+    nhs = NextHopSet([{'gateway': '10.0.0.1', 'oif': 3}])
+    nhs.remove({'gateway': '10.0.0.1', 'oif': 3})
+    nhs.add({'gateway': '10.0.0.1', 'oif': 4})
+    nhs.remove({'gateway': '10.0.0.1'})
+    assert len(nhs) == 0
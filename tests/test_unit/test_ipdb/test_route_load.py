@@ -0,0 +1,23 @@
+def test_load_keeps_empty_metrics(routes, route_msg):
+    routes.load_netlink(route_msg('10.0.0.0', 24, RTA_OIF=1))
+    route = routes['10.0.0.0/24']
+    metrics = route['metrics']
+    routes.load_netlink(route_msg('10.0.0.0', 24, RTA_OIF=2))
+    assert route['oif'] == 2
+    # nothing to reset, so the nested object is not replaced
+    assert route['metrics'] is metrics
+
+
+def test_load_drops_metrics(routes, route_msg):
+    routes.load_netlink(
+        route_msg(
+            '10.0.0.0',
+            24,
+            RTA_OIF=1,
+            RTA_METRICS={'attrs': [('RTAX_MTU', 1400)]},
+        )
+    )
+    route = routes['10.0.0.0/24']
+    assert route['metrics']['mtu'] == 1400
+    routes.load_netlink(route_msg('10.0.0.0', 24, RTA_OIF=1))
+    assert not any(route['metrics'].values())
@@ -0,0 +1,129 @@
+import random
+import threading
+from socket import AF_INET6
+
+from pyroute2.common import AF_MPLS
+
+
+def check(table, routes):
+    live = [x['route'] for x in table.__nogc__()]
+    assert routes.keys() == [x['dst'] for x in live]
+    assert len(table) == len(live)
+    records = tuple(table.idx.values())
+    for field in ('oif', 'gateway', 'proto', 'family'):
+        for value in set([x['route'].get(field) for x in records]):
+            expected = [x for x in records if x['route'].get(field) == value]
+            assert list(routes.filter({field: value})) == expected
+    for route in live:
+        assert routes.describe(route['dst'])['route']['dst'] == route['dst']
+
+
+def test_churn(routes, route_msg):
+    rnd = random.Random(42)
+    table = routes.tables[254]
+    inserted = 0
+    for step in range(2000):
+        net = '10.0.%i.0' % rnd.randrange(64)
+        oif = rnd.randrange(1, 5)
+        op = rnd.random()
+        if op < 0.6:
+            attrs = {'RTA_OIF': oif}
+            if rnd.random() < 0.5:
+                attrs['RTA_GATEWAY'] = '172.16.0.%i' % oif
+            if not [x for x in table.idx if x.dst == net + '/24']:
+                inserted += 1
+            routes.load_netlink(route_msg(net, 24, **attrs))
+        elif op < 0.95:
+            routes.load_netlink(
+                route_msg(net, 24, event='RTM_DELROUTE', RTA_OIF=oif)
+            )
+        else:
+            # the link goes down, the routes via it are marked and
+            # then dropped by gc, since the dump finds nothing
+            routes.gc_mark_link({'family': 0, 'state': 'down', 'index': oif})
+            check(table, routes)
+            for record in tuple(table.idx.values()):
+                record['route']._gctime = 0
+            routes.gc()
+            assert not [
+                x for x in table.idx.values() if x['route']['oif'] == oif
+            ]
+        if step % 50 == 0:
+            check(table, routes)
+    check(table, routes)
+    # the columns are compacted, not only appended to
+    assert len(table._keys) < inserted
+
+
+def test_filter_compact(routes, route_msg):
+    for i in range(8):
+        routes.load_netlink(route_msg('10.0.%i.0' % i, 24, RTA_OIF=1))
+    for i in range(6):
+        routes.load_netlink(route_msg('fd00:%i::' % i, 64, RTA_OIF=1))
+    table = routes.tables[254]
+
+    def drop():
+        # the last unlink compacts the columns
+        for i in range(8):
+            routes.load_netlink(
+                route_msg('10.0.%i.0' % i, 24, event='RTM_DELROUTE', RTA_OIF=1)
+            )
+
+    class Columns(dict):
+        thread = None
+
+        def __getitem__(self, key):
+            # run the event thread right after filter() gets the column
+            ret = dict.__getitem__(self, key)
+            if key == 'family' and self.thread is None:
+                self.thread = threading.Thread(target=drop)
+                self.thread.start()
+                self.thread.join(0.2)
+            return ret
+
+    table._cols = columns = Columns(table._cols)
+    ret = list(routes.filter({'family': AF_INET6}))
+    columns.thread.join()
+    assert len(ret) == 6
+    assert len(table._keys) == 6
+
+
+def test_filter_lazy_index(routes, route_msg):
+    for i in range(8):
+        routes.load_netlink(
+            route_msg('10.0.%i.0' % i, 24, RTA_IIF=i % 4 + 1, RTA_OIF=1)
+        )
+    table = routes.tables[254]
+    # small buckets are sorted by the table order
+    for iif, expected in ((1, [0, 4]), (2, [1, 5])):
+        ret = routes.filter({'iif': iif})
+        assert [x['route']['dst'] for x in ret] == [
+            '10.0.%i.0/24' % i for i in expected
+        ]
+    assert 'iif' in table._by
+    # a large one is walked in the table order
+    assert [x['route']['dst'] for x in routes.filter({'oif': 1})] == [
+        '10.0.%i.0/24' % i for i in range(8)
+    ]
+    # not selective, so not indexed
+    assert len(list(routes.filter({'proto': 3}))) == 8
+    assert 'proto' not in table._by
+
+
+def test_mpls_keys(routes, route_msg):
+    def label(value):
+        return [{'label': value, 'bos': 1}]
+
+    for value in (0, 16, 17, 18):
+        routes.load_netlink(
+            route_msg(label(value), 20, family=AF_MPLS, RTA_OIF=1)
+        )
+    assert routes.keys('mpls') == [0, 16, 17, 18]
+    routes.load_netlink(
+        route_msg(
+            label(16), 20, event='RTM_DELROUTE', family=AF_MPLS, RTA_OIF=1
+        )
+    )
+    # label 0 is a valid key
+    assert routes.keys('mpls') == [0, 17, 18]
+    assert len(routes.tables['mpls']) == 3
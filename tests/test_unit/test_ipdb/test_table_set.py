@@ -0,0 +1,46 @@
+import pytest
+
+
+def test_describe(routes, route_msg):
+    routes.load_netlink(route_msg('10.0.0.0', 24, RTA_OIF=1, RTA_PRIORITY=20))
+    routes.load_netlink(route_msg('10.0.0.0', 24, RTA_OIF=2, RTA_PRIORITY=10))
+    # the first record in the table order
+    assert routes.describe('10.0.0.0/24')['route']['oif'] == 1
+    with pytest.raises(KeyError):
+        routes.describe('10.0.1.0/24')
+
+
+def test_get(routes, route_msg):
+    routes.load_netlink(route_msg('10.0.0.0', 24, RTA_OIF=1))
+    for table in (100, 200):
+        routes.load_netlink(
+            route_msg('10.0.0.0', 24, table=table, RTA_OIF=table)
+        )
+    assert routes.get('10.0.0.0/24')['oif'] == 1
+    for table in (100, 200, 100):
+        assert routes.get('10.0.0.0/24', table=table)['oif'] == table
+    with pytest.raises(KeyError):
+        routes.get('10.0.0.0/24', table=300)
+
+
+def test_filter(routes, route_msg):
+    for table in (100, 254):
+        routes.load_netlink(route_msg('10.0.0.0', 24, table=table, RTA_OIF=2))
+    routes.load_netlink(route_msg('10.0.1.0', 24, RTA_OIF=3))
+    ret = routes.filter({'oif': 2})
+    assert not isinstance(ret, list)
+    assert sorted([x['route']['table'] for x in ret]) == [100, 254]
+
+
+def test_tables(routes, route_msg):
+    tables = (0, 100, 255, 256, 1000)
+    for table in tables:
+        routes.load_netlink(route_msg('10.0.0.0', 24, table=table, RTA_OIF=1))
+    for table in tables:
+        assert routes.keys(table) == ['10.0.0.0/24']
+        routes.load_netlink(
+            route_msg(
+                '10.0.0.0', 24, event='RTM_DELROUTE', table=table, RTA_OIF=1
+            )
+        )
+        assert routes.keys(table) == []